@@ -2,26 +2,27 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
-from sklearn.pipeline import make_pipeline
 import matplotlib.font_manager as fm
 import os
 
 # ------------------------
 # 0. 한글 폰트 설정
 # ------------------------
+# 폰트 등록은 프로세스당 한 번만 수행하고, 해석된 FontProperties를 캐시해 텍스트마다 직접 지정
+@st.cache_resource(show_spinner=False)
 def set_korean_font():
     font_path = "NanumGothic-Regular.ttf"
     if os.path.exists(font_path):
-        fm.fontManager.addfont(font_path)
+        if "NanumGothic" not in {f.name for f in fm.fontManager.ttflist}:
+            fm.fontManager.addfont(font_path)
         plt.rcParams['font.family'] = 'NanumGothic'
         plt.rcParams['axes.unicode_minus'] = False
+        return fm.FontProperties(fname=font_path)
     else:
         print("❗ NanumGothic-Regular.ttf 파일을 찾을 수 없습니다.")
+        return None
 
-set_korean_font()
+KOREAN_FONT = set_korean_font()
 
 # ------------------------
 # 1. 페이지 설정
@@ -32,37 +33,134 @@ st.title("📆 월별 기준금리 기반 아파트 평균가격 예측기 (비
 # ------------------------
 # 2. 데이터 로딩
 # ------------------------
+DATA_CSV = "월별_아파트_기준금리_통합.csv"
+
+def preprocess_to_parquet(csv_path, parquet_path):
+    # CSV 파싱과 전처리(결측 제거, 년월 생성)는 원본이 바뀌었을 때만 한 번에 수행하고,
+    # 평소에는 전처리가 끝난 컬럼형 Parquet 파일을 그대로 읽음
+    if not os.path.exists(parquet_path) or os.path.getmtime(parquet_path) < os.path.getmtime(csv_path):
+        df = pd.read_csv(csv_path, parse_dates=["날짜"]).dropna(subset=["기준금리", "평균가격"])
+        df["년월"] = df["날짜"].dt.strftime("%Y년 %m월")
+        df.to_parquet(parquet_path, engine="pyarrow", compression="snappy", index=False)
+    return parquet_path
+
+# 디스크 캐시는 재시작 후에도 유지되므로 CSV 수정 시각을 인자로 받아 캐시 키에 포함시킴
+# (원본 CSV가 바뀌면 새 키로 다시 로드되고, 그때 Parquet도 재생성됨)
+@st.cache_data(persist="disk", show_spinner=False)
+
+def load_data(csv_mtime):
+    parquet_path = preprocess_to_parquet(DATA_CSV, "월별_아파트_기준금리_전처리.parquet")
+    df = pd.read_parquet(parquet_path, engine="pyarrow")
+    # 지역을 범주형으로 바꿔 groupby가 문자열 해싱 대신 정수 코드를 사용하도록 함
+    df["지역"] = df["지역"].astype("category")
+    # 월별 집계값이므로 float32로도 충분한 정밀도 → 메모리/캐시 크기 절반
+    df["평균가격"] = df["평균가격"].astype("float32")
+    df["기준금리"] = df["기준금리"].astype("float32")
+    # 지역별로 날짜순 정렬 + 날짜 인덱스로 미리 분리해 두어 재실행 시 전체 스캔 없이 슬라이싱
+    groups = {region: g.sort_values("날짜", kind="stable").set_index("날짜") for region, g in df.groupby("지역", observed=True)}
+    # 지역 목록, 연월 옵션, 연월 → 날짜 매핑도 데이터와 함께 캐시
+    regions = list(df["지역"].cat.categories)
+    ym_map = dict(zip(df["년월"], df["날짜"]))
+    ym_options = sorted(ym_map)
+    return groups, regions, ym_options, ym_map
+
+csv_mtime = os.path.getmtime(DATA_CSV)
+data, regions, ym_options, ym_map = load_data(csv_mtime)
+
 @st.cache_data
+def load_lagged_rate(region, lag, csv_mtime):
+    # 지역별 프레임이 이미 날짜순이므로 groupby/shift 없이 배열을 lag만큼 밀어서 시차 적용
+    rate = load_data(csv_mtime)[0][region]["기준금리"].to_numpy()
+    lagged = np.full(len(rate), np.nan, dtype=rate.dtype)
+    lagged[lag:] = rate[:max(len(rate) - lag, 0)]
+    return lagged
+
+def fit_and_corr(x, y):
+    # 2차 회귀 계수와 상관계수를 평균을 뺀(중심화한) 합으로 함께 계산
+    # 저장은 float32지만 제곱합은 float32에서 정밀도가 부족하므로 float64로 누적
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    x_mean, y_mean = x.mean(), y.mean()
+    xc = x - x_mean
+    yc = y - y_mean
+    sxx = (xc * xc).sum()
+    # 기간 내 기준금리가 일정하면 기울기를 정할 수 없으므로 평균가격으로 예측
+    if sxx == 0.0:
+        return np.array([y_mean, 0.0, 0.0]), np.nan
+    # x, x² 열을 각각 중심화한 2×2 정규방정식 (sklearn LinearRegression과 같은 방식)
+    # 기준금리 값이 두 종류뿐이면 특이행렬이 되므로 lstsq의 최소 노름 해를 사용
+    q = x * x
+    q_mean = q.mean()
+    qc = q - q_mean
+    sxq = (xc * qc).sum()
+    normal = np.array([[sxx, sxq], [sxq, (qc * qc).sum()]])
+    rhs = np.array([(xc * yc).sum(), (qc * yc).sum()])
+    (c1, c2), *_ = np.linalg.lstsq(normal, rhs, rcond=1e-10)
+    coeffs = np.array([y_mean - c1 * x_mean - c2 * q_mean, c1, c2])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = rhs[0] / np.sqrt(sxx * (yc * yc).sum())
+    return coeffs, corr
+
+# 회귀 계수는 지역/기간/시차(와 데이터 버전)에만 의존하므로 기준금리 슬라이더 조작 시 재학습하지 않음
+@st.cache_data(max_entries=100)
+def fit_model(region, start_date, end_date, lag, csv_mtime, _x, _y):
+    return fit_and_corr(_x, _y)
+
+def rate_slider(container):
+    # 데이터가 부족한 경우에도 같은 key로 그려서 입력값이 유지되도록 함
+    return container.slider("📉 기준금리 입력 (%)", 0.0, 10.0, 3.5, step=0.1, key="input_rate")
+
+# 기준금리 입력에만 의존하는 예측 결과와 산점도는 fragment로 분리해,
+# 기준금리 슬라이더를 움직일 때 시계열 그래프까지 다시 그리지 않고 이 부분만 재실행
+@st.fragment
+def render_prediction(rate_slot, region, lag, x, y, coeffs, corr, period_caption):
+    input_rate = rate_slider(rate_slot)
+    predicted_price = coeffs[0] + coeffs[1] * input_rate + coeffs[2] * input_rate * input_rate
 
-def load_data():
-    df = pd.read_csv("월별_아파트_기준금리_통합.csv")
-    df["날짜"] = pd.to_datetime(df["날짜"])
-    df = df.dropna(subset=["기준금리", "평균가격"])
-    df["년월"] = df["날짜"].dt.strftime("%Y년 %m월")
-    return df
+    # ------------------------
+    # 7. 결과 출력
+    # ------------------------
+    st.subheader(f"🔍 {region} 지역 기준금리 {input_rate:.1f}%에 대한 예측")
+    st.metric("📊 예상 평균 아파트 가격", f"{predicted_price:,.0f} 백만원")
+    st.write(f"📈 기준금리(시차 {lag}개월)와 아파트 평균가격 간 상관계수: **{corr:.3f}**")
+    st.caption(period_caption)
 
-data = load_data()
+    # ------------------------
+    # 8. 산점도 + 회귀 곡선
+    # ------------------------
+    fig, ax = plt.subplots()
+    ax.scatter(x, y, s=40)
+
+    # 2차 곡선은 50개 점으로도 충분히 매끄러움
+    lo, hi = float(x.min()), float(x.max())
+    x_range = np.linspace(lo, hi, 50)
+    y_pred_curve = coeffs[0] + coeffs[1] * x_range + coeffs[2] * x_range * x_range
+    ax.plot(x_range, y_pred_curve, color='red', label="회귀 곡선")
+
+    ax.scatter(input_rate, predicted_price, color="blue", s=100, label="예측값")
+    ax.set_title(f"[ {region} ] 기준금리(시차 {lag}개월)와 아파트 평균가격 관계 (비선형 회귀)", fontproperties=KOREAN_FONT)
+    ax.set_xlabel(f"기준금리 (시차 {lag}개월)", fontproperties=KOREAN_FONT)
+    ax.set_ylabel("평균 아파트 가격 (백만원)", fontproperties=KOREAN_FONT)
+    ax.legend(prop=KOREAN_FONT)
+    st.pyplot(fig)
+    plt.close(fig)
 
 # ------------------------
 # 3. 사용자 입력
 # ------------------------
 st.sidebar.header("📌 사용자 설정")
-regions = sorted(data["지역"].unique())
 selected_region = st.sidebar.selectbox("📍 지역 선택", regions)
 
 # 연월 슬라이더
-ym_options = sorted(data["년월"].unique())
-def ym_to_date(ym_str):
-    return pd.to_datetime(ym_str.replace("년 ", "-").replace("월", "-01"))
-
 start_ym, end_ym = st.sidebar.select_slider("📅 분석 기간 설정 (연월)",
     options=ym_options,
     value=(ym_options[0], ym_options[-1]))
 
-start_date = ym_to_date(start_ym)
-end_date = ym_to_date(end_ym)
+start_date = ym_map[start_ym]
+end_date = ym_map[end_ym]
 
-input_rate = st.sidebar.slider("📉 기준금리 입력 (%)", 0.0, 10.0, 3.5, step=0.1)
+# 기준금리 슬라이더는 fragment 안에서 그려지므로 사이드바 위치만 미리 확보
+rate_slot = st.sidebar.container()
 
 # ✅ 시차 선택
 lag_months = st.sidebar.slider("⏱ 시차 (개월)", min_value=0, max_value=12, value=3)
@@ -70,73 +168,47 @@ lag_months = st.sidebar.slider("⏱ 시차 (개월)", min_value=0, max_value=12,
 # ------------------------
 # 4. 시차 반영
 # ------------------------
-data = data.sort_values(by=["지역", "날짜"])
-data["기준금리_시차"] = data.groupby("지역")["기준금리"].shift(lag_months)
+region_data = data[selected_region].assign(기준금리_시차=load_lagged_rate(selected_region, lag_months, csv_mtime))
 
 # ------------------------
 # 5. 데이터 필터링
 # ------------------------
-region_data = data[(data["지역"] == selected_region) &
-                   (data["날짜"] >= start_date) & (data["날짜"] <= end_date)]
+region_data = region_data.loc[start_date:end_date]
 region_data = region_data.dropna(subset=["기준금리_시차", "평균가격"])
 
 if not region_data.empty and len(region_data) >= 3:
-    region_data = region_data.copy()
-
     # ------------------------
     # 6. 비선형 회귀 모델 학습 (2차 다항식)
     # ------------------------
-    X = region_data[["기준금리_시차"]]
-    y = region_data["평균가격"]
-    poly_model = make_pipeline(PolynomialFeatures(degree=2), LinearRegression())
-    poly_model.fit(X, y)
-    predicted_price = poly_model.predict(np.array([[input_rate]])).flatten()[0]
-
-    # ------------------------
-    # 7. 결과 출력
-    # ------------------------
-    corr = region_data["기준금리_시차"].corr(region_data["평균가격"])
-    st.subheader(f"🔍 {selected_region} 지역 기준금리 {input_rate:.1f}%에 대한 예측")
-    st.metric("📊 예상 평균 아파트 가격", f"{predicted_price:,.0f} 백만원")
-    st.write(f"📈 기준금리(시차 {lag_months}개월)와 아파트 평균가격 간 상관계수: **{corr:.3f}**")
-    st.caption(f"※ 선택된 기간: {start_ym} ~ {end_ym}, 총 {len(region_data)}개월")
+    x = region_data["기준금리_시차"].to_numpy()
+    y = region_data["평균가격"].to_numpy()
+    dates = region_data.index.to_numpy()
+    coeffs, corr = fit_model(selected_region, start_date, end_date, lag_months, csv_mtime, x, y)
 
-    # ------------------------
-    # 8. 산점도 + 회귀 곡선
-    # ------------------------
-    fig, ax = plt.subplots()
-    sns.scatterplot(data=region_data, x="기준금리_시차", y="평균가격", ax=ax, s=40)
-
-    x_range = np.linspace(X.min(), X.max(), 100).reshape(-1, 1)
-    y_pred_curve = poly_model.predict(x_range)
-    ax.plot(x_range, y_pred_curve, color='red', label="회귀 곡선")
-
-    ax.scatter(input_rate, predicted_price, color="blue", s=100, label="예측값")
-    ax.set_title(f"[ {selected_region} ] 기준금리(시차 {lag_months}개월)와 아파트 평균가격 관계 (비선형 회귀)")
-    ax.set_xlabel(f"기준금리 (시차 {lag_months}개월)")
-    ax.set_ylabel("평균 아파트 가격 (백만원)")
-    ax.legend()
-    st.pyplot(fig)
+    render_prediction(rate_slot, selected_region, lag_months, x, y, coeffs, corr,
+                      f"※ 선택된 기간: {start_ym} ~ {end_ym}, 총 {len(region_data)}개월")
 
     # ------------------------
     # 9. 시간 흐름에 따른 추이
     # ------------------------
     fig2, ax1 = plt.subplots(figsize=(8, 4))
     color1 = "tab:blue"
-    ax1.set_xlabel("날짜")
-    ax1.set_ylabel("평균 아파트 가격", color=color1)
-    ax1.plot(region_data["날짜"], region_data["평균가격"], marker='o', color=color1)
+    ax1.set_xlabel("날짜", fontproperties=KOREAN_FONT)
+    ax1.set_ylabel("평균 아파트 가격", color=color1, fontproperties=KOREAN_FONT)
+    ax1.plot(dates, y, marker='o', color=color1)
     ax1.tick_params(axis='y', labelcolor=color1)
 
     ax2 = ax1.twinx()
     color2 = "tab:red"
-    ax2.set_ylabel("기준금리 (시차 적용)", color=color2)
-    ax2.plot(region_data["날짜"], region_data["기준금리_시차"], marker='s', linestyle='--', color=color2)
+    ax2.set_ylabel("기준금리 (시차 적용)", color=color2, fontproperties=KOREAN_FONT)
+    ax2.plot(dates, x, marker='s', linestyle='--', color=color2)
     ax2.tick_params(axis='y', labelcolor=color2)
 
-    plt.title(f"[ {selected_region} ] 월별 평균 아파트 가격 및 기준금리(시차 {lag_months}개월) 추이")
+    plt.title(f"[ {selected_region} ] 월별 평균 아파트 가격 및 기준금리(시차 {lag_months}개월) 추이", fontproperties=KOREAN_FONT)
     fig2.tight_layout()
     st.pyplot(fig2)
+    plt.close(fig2)
 
 else:
+    rate_slider(rate_slot)
     st.warning("해당 지역의 데이터가 부족하거나 선택한 기간 내 정보가 충분하지 않습니다.")